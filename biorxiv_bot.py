@@ -11,6 +11,7 @@ import json
 import yaml
 import asyncio
 import time
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -23,7 +24,7 @@ from biorxiv_fetch import fetch_window, pack_papers
 from pubmed_fetch import fetch_pubmed_articles
 from summarizer_api import run_ollama
 from state import PeriodState
-from email_sender import send_digest_email, send_error_notification
+from email_sender import send_digest_email_async, send_error_notification
 
 # 设置日志
 logging.basicConfig(
@@ -59,11 +60,16 @@ BOT_STATUS = {
     "last_report": None,
     "total_reports": 0,
     "total_papers": 0,
-    "errors": []
+    "errors": deque(maxlen=100)  # 有界错误历史，长时间运行不泄漏内存
 }
 
 # 创建调度器
-scheduler = AsyncIOScheduler(timezone=TZNAME)
+# coalesce: 错过的多次触发合并为一次；max_instances: 报告生成绝不重叠运行；
+# misfire_grace_time: 晚触发 5 分钟以内仍然执行
+scheduler = AsyncIOScheduler(
+    timezone=TZNAME,
+    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 300}
+)
 
 
 async def generate_and_send_digest(period_label: str, manual=False):
@@ -76,104 +82,119 @@ async def generate_and_send_digest(period_label: str, manual=False):
     """
     try:
         logger.info("=" * 80)
-        logger.info(f"🚀 开始生成{period_label}")
+        logger.info("🚀 开始生成%s", period_label)
         logger.info("=" * 80)
         
         # 计算时间窗口
         now_local = now_in_tz(TZNAME)
         since_local = last_window_start(TZNAME, WINDOW_H)
         
-        logger.info(f"📅 时间窗口: {since_local} ~ {now_local}")
+        logger.info("📅 时间窗口: %s ~ %s", since_local, now_local)
         
-        # 获取文章
-        logger.info("📥 正在从 BioRxiv 获取文章...")
-        biorxiv_articles = fetch_window(CFG, since_local, now_local)
+        # 获取文章（BioRxiv 与 PubMed 并发执行，阻塞调用放到线程中，不卡住事件循环）
+        # 每个来源有独立的超时预算，单个端点挂起不会拖垮整期简报
+        logger.info("📥 正在并发获取 BioRxiv 与 PubMed 文章...")
+        bio_task = asyncio.create_task(asyncio.wait_for(
+            asyncio.to_thread(fetch_window, CFG, since_local, now_local), timeout=90))
+        pub_task = asyncio.create_task(asyncio.wait_for(
+            asyncio.to_thread(fetch_pubmed_articles, CFG, 3), timeout=60))
+        biorxiv_articles, pubmed_articles = await asyncio.gather(bio_task, pub_task, return_exceptions=True)
+
+        if isinstance(biorxiv_articles, Exception):
+            logger.warning("⚠️ BioRxiv 获取失败: %s", biorxiv_articles)
+            biorxiv_articles = []
+        if isinstance(pubmed_articles, Exception):
+            logger.warning("⚠️ PubMed 获取失败: %s", pubmed_articles)
+            pubmed_articles = []
+
         biorxiv_data = pack_papers(CFG, biorxiv_articles)
-        
-        logger.info(f"✅ BioRxiv: {len(biorxiv_data)} 篇文章")
-        
-        # 获取 PubMed 文章（Nature/Science/Cell等）
-        logger.info("📥 正在从 PubMed 获取顶级期刊文章...")
-        try:
-            pubmed_articles = fetch_pubmed_articles(CFG, days=3)
-            pubmed_data = pack_papers(CFG, pubmed_articles)
-            logger.info(f"✅ PubMed: {len(pubmed_data)} 篇文章")
-        except Exception as e:
-            logger.warning(f"⚠️ PubMed 获取失败: {e}")
-            pubmed_data = []
+        pubmed_data = pack_papers(CFG, pubmed_articles)
+
+        logger.info("✅ BioRxiv: %d 篇文章", len(biorxiv_data))
+        logger.info("✅ PubMed: %d 篇文章", len(pubmed_data))
         
         # 合并数据
         data = biorxiv_data + pubmed_data
-        logger.info(f"📊 合并后总计: {len(data)} 篇文章")
-        
+        logger.info("📊 合并后总计: %d 篇文章", len(data))
+
         BOT_STATUS["last_fetch"] = now_local
-        BOT_STATUS["total_papers"] += len(data)
-        
-        logger.info(f"✅ 获取到 {len(data)} 篇文章")
-        
-        # 如果没有文章
+
+        # 如果没有文章：在 JSON 序列化 / PeriodState / LLM 之前直接短路，
+        # 不创建空的状态目录
         if len(data) == 0:
             logger.warning("⚠️ 本次时间窗口内没有新文章")
-            # 可选：发送无文章通知邮件
-            # send_digest_email(period_label, "# 本次时间窗口内没有新的肿瘤学相关文章\n\n请稍后再试。")
+            # 可选：跳过 LLM，直接发送静态"无更新"通知邮件
+            if CFG.get("send_empty_digest", False):
+                empty_md = (
+                    "# 本次时间窗口内没有新的肿瘤学相关文章\n\n"
+                    f"时间窗口: {since_local.strftime('%Y-%m-%d %H:%M')} ~ "
+                    f"{now_local.strftime('%Y-%m-%d %H:%M')}\n\n"
+                    "请等待下一期简报。"
+                )
+                await send_digest_email_async(period_label, empty_md)
             return True
-        
-        # 保存原始数据
+
+        BOT_STATUS["total_papers"] += len(data)
+
         period = fmt_period(now_local)
         st = PeriodState(period)
-        st.save_raw(data)
-        logger.info(f"💾 原始数据已保存: {period}")
-        
+
         # 使用 AI 生成摘要
         logger.info("🤖 正在使用 AI 生成研究简报...")
 
         
-        summary_md = run_ollama(
+        # 只序列化一次，LLM 输入与上下文存档共用同一份字符串
+        data_json = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+        summary_md = await asyncio.to_thread(
+            run_ollama,
             CFG,
             period_label,
             since_local.isoformat(),
             now_local.isoformat(),
-            json.dumps(data, ensure_ascii=False)
-        )
-        
-        st.save_report(summary_md)
-        logger.info(f"💾 简报已保存")
-        
-        # 生成上下文（用于后续对话）
-        prompt_ctx = (
-            "# 原始条目 (JSON)\n" +
-            json.dumps(data, ensure_ascii=False, indent=2) +
-            "\n\n# 研究简报 (Markdown)\n" +
-            summary_md
+            data_json
         )
-        st.save_prompt(prompt_ctx)
         
+        # 持久化放到后台线程（raw/report/对话上下文一次写完），与邮件发送重叠进行
+        save_task = asyncio.create_task(asyncio.to_thread(st.save_all, data, data_json, summary_md))
+
         # 发送邮件
         logger.info("📧 正在发送邮件...")
-        email_success = send_digest_email(period_label, summary_md)
-        
+        email_success = await send_digest_email_async(period_label, summary_md, data_json)
+
+        await save_task
+        logger.info("💾 本期数据已保存: %s", period)
+
         if email_success:
-            logger.info(f"✅ {period_label}生成并发送成功！")
+            logger.info("✅ %s生成并发送成功！", period_label)
             BOT_STATUS["last_report"] = now_local
             BOT_STATUS["total_reports"] += 1
         else:
-            logger.error(f"❌ 邮件发送失败")
+            logger.error("❌ 邮件发送失败")
             return False
         
         logger.info("=" * 80)
-        logger.info(f"✨ {period_label}完成")
+        logger.info("✨ %s完成", period_label)
         logger.info("=" * 80)
         
         return True
         
     except Exception as e:
         error_msg = f"生成{period_label}失败: {str(e)}"
-        logger.error(f"❌ {error_msg}", exc_info=True)
+        logger.error("❌ %s", error_msg, exc_info=True)
         
-        BOT_STATUS["errors"].append({
-            "time": datetime.now(),
-            "error": error_msg
-        })
+        # 连续重复的错误只累加计数，不无限追加
+        errors = BOT_STATUS["errors"]
+        if errors and errors[-1]["error"] == error_msg:
+            errors[-1]["count"] += 1
+            errors[-1]["last"] = datetime.now()
+        else:
+            errors.append({
+                "time": datetime.now(),
+                "last": datetime.now(),
+                "error": error_msg,
+                "count": 1
+            })
         
         # 发送错误通知邮件
         try:
@@ -210,10 +231,10 @@ def start_scheduler():
                 replace_existing=True
             )
             
-            logger.info(f"✅ 已添加定时任务: {label} - 每天 {report_time}")
+            logger.info("✅ 已添加定时任务: %s - 每天 %s", label, report_time)
             
         except Exception as e:
-            logger.error(f"❌ 添加定时任务失败 ({report_time}): {e}")
+            logger.error("❌ 添加定时任务失败 (%s): %s", report_time, e)
     
     # 启动调度器
     scheduler.start()
@@ -223,7 +244,7 @@ def start_scheduler():
     jobs = scheduler.get_jobs()
     for job in jobs:
         next_run = job.next_run_time
-        logger.info(f"   📅 {job.name} 下次执行: {next_run}")
+        logger.info("   📅 %s 下次执行: %s", job.name, next_run)
 
 
 def stop_scheduler():
@@ -266,10 +287,11 @@ def show_status():
     
     # 显示错误
     if BOT_STATUS["errors"]:
-        recent_errors = BOT_STATUS["errors"][-3:]
+        recent_errors = list(BOT_STATUS["errors"])[-3:]
         print(f"\n⚠️  最近错误 ({len(BOT_STATUS['errors'])} 个):")
         for err in recent_errors:
-            print(f"   • {err['time'].strftime('%H:%M:%S')}: {err['error']}")
+            repeat = f" ×{err['count']}" if err.get("count", 1) > 1 else ""
+            print(f"   • {err['time'].strftime('%H:%M:%S')}: {err['error']}{repeat}")
     
     print("\n" + "=" * 80 + "\n")
 
@@ -288,13 +310,13 @@ async def manual_run(period_type="auto"):
     
     label = "早报" if period_type.lower() == "am" else "晚报"
     
-    logger.info(f"🎯 手动触发: {label}")
+    logger.info("🎯 手动触发: %s", label)
     success = await generate_and_send_digest(label, manual=True)
     
     if success:
-        logger.info(f"✅ 手动生成{label}成功")
+        logger.info("✅ 手动生成%s成功", label)
     else:
-        logger.error(f"❌ 手动生成{label}失败")
+        logger.error("❌ 手动生成%s失败", label)
     
     return success
 
@@ -304,20 +326,19 @@ async def main_loop():
     logger.info("\n" + "=" * 80)
     logger.info("🚀 BioRxiv 肿瘤学研究推送系统启动")
     logger.info("=" * 80)
-    logger.info(f"📅 启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    logger.info(f"🌐 时区: {TZNAME}")
-    logger.info(f"⏰ 报送时间: {', '.join(CFG.get('report_times', []))}")
-    logger.info(f"📧 收件人: {os.getenv('EMAIL_RECIPIENT', '未配置')}")
+    logger.info("📅 启动时间: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logger.info("🌐 时区: %s", TZNAME)
+    logger.info("⏰ 报送时间: %s", ', '.join(CFG.get('report_times', [])))
+    logger.info("📧 收件人: %s", os.getenv('EMAIL_RECIPIENT', '未配置'))
     logger.info("=" * 80 + "\n")
     
     # 启动调度器
     start_scheduler()
     
     try:
-        # 保持运行
-        while True:
-            await asyncio.sleep(60)  # 每分钟检查一次
-            
+        # 保持运行（APScheduler 自行调度回调，这里只需挂起等待）
+        await asyncio.Event().wait()
+
     except KeyboardInterrupt:
         logger.info("\n收到退出信号...")
     finally:
@@ -4,75 +4,181 @@ BioRxiv 文章获取模块
 支持通过 RSS Feed 获取最新的肿瘤学相关论文
 """
 
+import aiohttp
+import asyncio
 import feedparser
-import re
-from datetime import datetime, timedelta
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from dateutil.tz import gettz
-import time
+from email.utils import parsedate_to_datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import lxml.etree as LET
+except ImportError:
+    LET = None
+
+# BioRxiv RSS Feed URLs
+RSS_URLS = [
+    "https://connect.biorxiv.org/biorxiv_xml.php?subject=cancer_biology",
+    "https://connect.biorxiv.org/biorxiv_xml.php?subject=cell_biology",
+    "https://connect.biorxiv.org/biorxiv_xml.php?subject=immunology",
+]
+
+
+# lxml 标签名 -> 条目字段（BioRxiv Feed 是 RDF，dc: 前缀会被 QName 去掉）
+_FEED_TAG_MAP = {
+    'title': 'title',
+    'link': 'link',
+    'description': 'summary',
+    'date': 'published',
+    'creator': 'author',
+    'identifier': 'id',
+    'subject': 'category',
+}
+
+
+def _parse_feed(body):
+    """
+    将 RSS/RDF 字节流解析为条目字典列表
+
+    优先用 lxml（libxml2，C 实现，比 feedparser 的纯 Python
+    清洗流程快一个数量级且内存更省）；lxml 不可用或解析失败时
+    回退到 feedparser
+    """
+    if LET is not None:
+        try:
+            root = LET.fromstring(body)
+            entries = []
+            for item in root.iter():
+                if LET.QName(item).localname != 'item':
+                    continue
+                entry = {}
+                for child in item:
+                    key = _FEED_TAG_MAP.get(LET.QName(child).localname)
+                    if key:
+                        entry[key] = (child.text or '').strip()
+                if entry:
+                    entries.append(entry)
+            return entries
+        except Exception as e:
+            logger.warning("lxml 解析 Feed 失败，回退到 feedparser: %s", e)
+    return feedparser.parse(body).entries
+
+
+async def _fetch_feed(session, rss_url, retries=4, base=0.5, cap=8.0):
+    """
+    下载并解析单个 RSS Feed（解析在线程中进行，不阻塞事件循环）
+
+    429/5xx 或网络错误时按指数退避 + 随机抖动重试，
+    避免一次上游抖动丢掉整个 Feed
+    """
+    last_exc = None
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = min(cap, base * 2 ** (attempt - 1)) + random.uniform(0, base)
+            await asyncio.sleep(delay)
+        try:
+            logger.info("正在获取 RSS Feed: %s", rss_url)
+            async with session.get(rss_url) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    logger.warning("RSS Feed 返回 %s，将重试 (%s/%s): %s", resp.status, attempt + 1, retries + 1, rss_url)
+                    last_exc = aiohttp.ClientResponseError(
+                        resp.request_info, resp.history, status=resp.status
+                    )
+                    continue
+                resp.raise_for_status()
+                body = await resp.read()
+            return await asyncio.to_thread(_parse_feed, body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            last_exc = e
+            logger.warning("RSS Feed 请求失败，将重试 (%s/%s): %s", attempt + 1, retries + 1, e)
+    raise last_exc
+
+
+# 三个 Feed 同主机，共享会话可复用 TCP/TLS 连接；gzip 可把 XML 压缩 3-5 倍
+_HTTP_HEADERS = {
+    'Accept-Encoding': 'gzip',
+    'User-Agent': 'BioRxivPush/1.0',
+}
+
+
+async def _fetch_all_feeds(rss_urls):
+    """并发下载所有 RSS Feed（共享连接池），单个失败不影响其他"""
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(timeout=timeout, headers=_HTTP_HEADERS) as session:
+        tasks = [_fetch_feed(session, url) for url in rss_urls]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _run_async(coro):
+    """
+    在同步上下文执行协程
+
+    调用方线程已有运行中的事件循环时（如在 async 代码里直接调用，
+    没套 asyncio.to_thread），asyncio.run 会报错，改到独立线程里跑
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
 
 def fetch_biorxiv_rss(category="cancer-biology", days=3):
     """
-    从 BioRxiv RSS Feed 获取文章
-    
+    从 BioRxiv RSS Feed 获取文章（所有 Feed 并发下载）
+
     Args:
         category: BioRxiv 分类 (cancer-biology, cell-biology, etc.)
         days: 获取最近几天的文章
-        
+
     Returns:
         list: 文章列表
     """
-    # BioRxiv RSS Feed URLs
-    rss_urls = [
-        "https://connect.biorxiv.org/biorxiv_xml.php?subject=cancer_biology",
-        "https://connect.biorxiv.org/biorxiv_xml.php?subject=cell_biology",
-        "https://connect.biorxiv.org/biorxiv_xml.php?subject=immunology",
-    ]
-    
-    all_articles = []
-    seen_ids = set()
-    
-    for rss_url in rss_urls:
+    # 以 id 为键存储，去重与收集共用一个结构；
+    # 先去重、再过滤时间，最后才构造文章字典，绝大多数被丢弃的条目不再付出构造成本
+    articles_by_id = {}
+
+    feeds = _run_async(_fetch_all_feeds(RSS_URLS))
+
+    for rss_url, entries in zip(RSS_URLS, feeds):
+        if isinstance(entries, Exception):
+            logger.error("获取 RSS Feed 失败 (%s): %s", rss_url, entries)
+            continue
         try:
-            logger.info(f"正在获取 RSS Feed: {rss_url}")
-            feed = feedparser.parse(rss_url)
-            
-            for entry in feed.entries:
+            for entry in entries:
                 # 提取文章ID（避免重复）
                 article_id = entry.get('id', entry.get('link', ''))
-                if article_id in seen_ids:
+                if article_id in articles_by_id:
                     continue
-                seen_ids.add(article_id)
-                
+
                 # 解析发布时间
+                # BioRxiv 时间格式: "Tue, 15 Oct 2024 00:00:00 GMT"（RFC 2822）
                 published_str = entry.get('published', entry.get('updated', ''))
                 try:
-                    # BioRxiv 时间格式: "Tue, 15 Oct 2024 00:00:00 GMT"
-                    from dateutil import parser
-                    import pytz
-                    
-                    # 使用 dateutil.parser 解析时间（自动处理时区）
-                    published_dt = parser.parse(published_str)
-                    
-                    # 如果没有时区信息，假设为 UTC
-                    if published_dt.tzinfo is None:
-                        published_dt = pytz.utc.localize(published_dt)
-                except:
-                    # 解析失败，使用当前时间（带时区）
-                    import pytz
-                    published_dt = datetime.now(pytz.utc)
-                
+                    published_dt = parsedate_to_datetime(published_str)
+                except (TypeError, ValueError):
+                    # dc:date 是 ISO 格式（如 "2024-10-15"），RFC 2822 解析不了时再试一次
+                    try:
+                        published_dt = datetime.fromisoformat(published_str.strip())
+                    except ValueError:
+                        # 解析失败：跳过该条目，避免把旧文章当成"今天"混进时间窗口
+                        continue
+
+                # 如果没有时区信息，假设为 UTC
+                if published_dt.tzinfo is None:
+                    published_dt = published_dt.replace(tzinfo=timezone.utc)
+
                 # 只获取最近几天的文章
-                import pytz
-                now_utc = datetime.now(pytz.utc)
-                time_diff = now_utc - published_dt
-                if time_diff.days > days:
+                if (datetime.now(timezone.utc) - published_dt).days > days:
                     continue
                 
-                all_articles.append({
+                articles_by_id[article_id] = {
                     'id': article_id,
                     'title': entry.get('title', ''),
                     'link': entry.get('link', ''),
@@ -80,17 +186,16 @@ def fetch_biorxiv_rss(category="cancer-biology", days=3):
                     'authors': entry.get('author', 'Unknown'),
                     'published': published_dt,
                     'category': entry.get('category', category),
-                })
-                
-            logger.info(f"从 {rss_url} 获取到 {len(feed.entries)} 篇文章")
-            time.sleep(1)  # 避免请求过快
-            
+                }
+
+            logger.info("从 %s 获取到 %d 篇文章", rss_url, len(entries))
+
         except Exception as e:
-            logger.error(f"获取 RSS Feed 失败: {e}")
+            logger.error("解析 RSS Feed 失败 (%s): %s", rss_url, e)
             continue
     
-    logger.info(f"总共获取到 {len(all_articles)} 篇文章")
-    return all_articles
+    logger.info("总共获取到 %d 篇文章", len(articles_by_id))
+    return list(articles_by_id.values())
 
 
 def filter_by_keywords(articles, queries, exclude_keywords=None):
@@ -106,40 +211,42 @@ def filter_by_keywords(articles, queries, exclude_keywords=None):
         list: 过滤后的文章列表
     """
     filtered = []
-    exclude_keywords = exclude_keywords or []
-    exclude_keywords = [k.lower() for k in exclude_keywords]
-    
+
+    # 关键词规范化只做一次，不在每篇文章的循环里重复 lower()/建表
+    excl = tuple(k for k in ((e or '').lower() for e in (exclude_keywords or [])) if k)
+    norm_queries = []
+    for query_block in queries:
+        if 'any' in query_block:
+            # 任意一个关键词匹配即可
+            norm_queries.append(('any', tuple(k.lower() for k in query_block['any'])))
+        if 'all' in query_block:
+            # 所有关键词都必须匹配
+            norm_queries.append(('all', tuple(k.lower() for k in query_block['all'])))
+
     for article in articles:
-        title = article['title'].lower()
-        abstract = article['summary'].lower()
-        text = title + " " + abstract
-        
+        # 一次拼接、一次 lower
+        text = (article['title'] + " " + article['summary']).lower()
+
         # 排除关键词检查
-        if any(exc in text for exc in exclude_keywords if exc):
+        if any(exc in text for exc in excl):
             continue
-        
+
         # 关键词匹配检查
         matched = False
-        
-        for query_block in queries:
-            if 'any' in query_block:
-                # 任意一个关键词匹配即可
-                any_keywords = [k.lower() for k in query_block['any']]
-                if any(keyword in text for keyword in any_keywords):
-                    matched = True
-                    break
-            
-            if 'all' in query_block:
-                # 所有关键词都必须匹配
-                all_keywords = [k.lower() for k in query_block['all']]
-                if all(keyword in text for keyword in all_keywords):
+
+        for mode, keywords in norm_queries:
+            if mode == 'any':
+                if any(keyword in text for keyword in keywords):
                     matched = True
                     break
-        
+            elif all(keyword in text for keyword in keywords):
+                matched = True
+                break
+
         if matched:
             filtered.append(article)
     
-    logger.info(f"关键词过滤后剩余 {len(filtered)} 篇文章")
+    logger.info("关键词过滤后剩余 %d 篇文章", len(filtered))
     return filtered
 
 
@@ -159,7 +266,7 @@ def fetch_window(cfg, since_dt_local, now_local):
     days = (now_local - since_dt_local).days + 1
     days = max(1, min(days, 7))  # 限制在1-7天
     
-    logger.info(f"开始获取 BioRxiv 文章: {since_dt_local} ~ {now_local} ({days}天)")
+    logger.info("开始获取 BioRxiv 文章: %s ~ %s (%s天)", since_dt_local, now_local, days)
     
     # 获取 RSS 文章
     articles = fetch_biorxiv_rss(days=days)
@@ -194,7 +301,7 @@ def fetch_window(cfg, since_dt_local, now_local):
     max_items = cfg.get("digest_max_items", 20)
     result = filtered_articles[:max_items]
     
-    logger.info(f"最终获取到 {len(result)} 篇符合条件的文章")
+    logger.info("最终获取到 %d 篇符合条件的文章", len(result))
     return result
 
 
@@ -213,26 +320,27 @@ def pack_papers(cfg, articles):
     max_abs = int(cfg.get("abstract_max_chars", 500))
     
     for article in articles:
-        # 处理摘要长度
-        abs_text = re.sub(r"\s+", " ", article.get('summary', '')).strip()
+        # 处理摘要长度（split/join 折叠空白，比正则快数倍）
+        abs_text = " ".join(article.get('summary', '').split())
         if len(abs_text) > max_abs:
             abs_text = abs_text[:max_abs] + "…"
-        
+
         # 处理作者（如果是字符串则分割）
         authors = article.get('authors', 'Unknown')
         if isinstance(authors, str):
             authors = [a.strip() for a in authors.split(',')]
-        
+
+        pub = article.get('published')
         data.append({
             "id": article.get('id', ''),
             "title": article.get('title', '').strip().replace("\n", " "),
             "authors": authors,
             "primary_category": article.get('category', 'cancer-biology'),
-            "published": article.get('published').isoformat() if isinstance(article.get('published'), datetime) else str(article.get('published')),
+            "published": pub.isoformat() if isinstance(pub, datetime) else str(pub),
             "link": article.get('link', ''),
             "abstract": abs_text,
         })
     
-    logger.info(f"打包完成: {len(data)} 篇文章")
+    logger.info("打包完成: %d 篇文章", len(data))
     return data
 
@@ -1,5 +1,6 @@
 # bot.py
 import os, json, yaml, asyncio, psutil, subprocess, sys, time
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 from discord.ext import commands
@@ -46,10 +47,15 @@ BOT_STATUS = {
     "last_fetch": None,
     "last_report": None,
     "total_reports": 0,
-    "errors": []
+    "errors": deque(maxlen=100)  # 有界错误历史，长时间运行不泄漏内存
 }
 
-scheduler = AsyncIOScheduler(timezone=TZNAME)
+# coalesce: 错过的多次触发合并为一次；max_instances: 报告生成绝不重叠运行；
+# misfire_grace_time: 晚触发 5 分钟以内仍然执行
+scheduler = AsyncIOScheduler(
+    timezone=TZNAME,
+    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 300}
+)
 
 async def post_digest(period_label: str, manual=False):
     """生成并发送 arXiv 摘要报告"""
@@ -62,12 +68,12 @@ async def post_digest(period_label: str, manual=False):
         now_local = now_in_tz(TZNAME)
         since_local = last_window_start(TZNAME, WINDOW_H)
 
-        logger.info(f"开始获取论文: {since_local} ~ {now_local}")
+        logger.info("开始获取论文: %s ~ %s", since_local, now_local)
         papers = fetch_window(CFG, since_local, now_local)
         data = pack_papers(CFG, papers)
 
         BOT_STATUS["last_fetch"] = now_local
-        logger.info(f"获取到 {len(data)} 篇论文")
+        logger.info("获取到 %d 篇论文", len(data))
 
         # 如果没有论文，不生成报告
         if len(data) == 0:
@@ -102,13 +108,19 @@ async def post_digest(period_label: str, manual=False):
 
         BOT_STATUS["last_report"] = now_local
         BOT_STATUS["total_reports"] += 1
-        logger.info(f"报告生成完成: {period_label}")
+        logger.info("报告生成完成: %s", period_label)
         return True
 
     except Exception as e:
         error_msg = f"生成报告失败: {str(e)}"
         logger.error(error_msg)
-        BOT_STATUS["errors"].append({"time": datetime.now(), "error": error_msg})
+        # 连续重复的错误只累加计数，不无限追加
+        errors = BOT_STATUS["errors"]
+        if errors and errors[-1]["error"] == error_msg:
+            errors[-1]["count"] += 1
+            errors[-1]["last"] = datetime.now()
+        else:
+            errors.append({"time": datetime.now(), "last": datetime.now(), "error": error_msg, "count": 1})
         return False
 
 
@@ -201,7 +213,7 @@ async def status(ctx):
         embed.add_field(name=" 最后报告", value=BOT_STATUS["last_report"].strftime("%Y-%m-%d %H:%M:%S"), inline=True)
 
     if BOT_STATUS["errors"]:
-        recent_errors = BOT_STATUS["errors"][-3:]  # 最近3个错误
+        recent_errors = list(BOT_STATUS["errors"])[-3:]  # 最近3个错误
         error_text = "\n".join([f"• {e['time'].strftime('%H:%M:%S')}: {e['error']}" for e in recent_errors])
         embed.add_field(name=" 最近错误", value=error_text, inline=False)
 
@@ -259,7 +271,7 @@ async def config_manage(ctx, action: str, key: str = None, value: str = None):
                 yaml.safe_dump(CFG, f, allow_unicode=True, sort_keys=False)
 
             await ctx.send(f" 已更新 {key}: `{value}`")
-            logger.info(f"配置已更新: {key} = {value}")
+            logger.info("配置已更新: %s = %s", key, value)
 
         except Exception as e:
             await ctx.send(f" 更新失败: {str(e)}")
@@ -479,7 +491,7 @@ async def help_cmd(ctx):
 @bot.event
 async def on_ready():
     """Bot 启动事件"""
-    logger.info(f"Bot 已登录: {bot.user}")
+    logger.info("Bot 已登录: %s", bot.user)
 
     # 启动调度器
     start_scheduler()
@@ -490,7 +502,7 @@ async def on_ready():
         if channel:
             await channel.send(f" **arXiv Push 服务已启动**\n **Bot**: {bot.user.mention}\n **时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n **帮助**: 使用 `arxiv-help` 查看所有命令")
     except Exception as e:
-        logger.error(f"发送启动消息失败: {e}")
+        logger.error("发送启动消息失败: %s", e)
 
 @bot.event
 async def on_message(message: discord.Message):
@@ -556,7 +568,7 @@ async def on_message(message: discord.Message):
             await message.channel.send(chunk)
 
     except Exception as e:
-        logger.error(f"处理消息失败: {e}")
+        logger.error("处理消息失败: %s", e)
         import traceback
         traceback.print_exc()
 
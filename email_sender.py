@@ -4,44 +4,149 @@
 支持 SMTP 发送 HTML 格式的研究简报
 """
 
+import asyncio
+import functools
+import gzip
+import re
 import smtplib
+import socket
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.header import Header
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
 from dotenv import load_dotenv
 import logging
 import markdown
 
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 
-def markdown_to_html(md_text):
+def _smtp_settings(recipient=None):
     """
-    将 Markdown 文本转换为 HTML
-    
-    Args:
-        md_text: Markdown 格式的文本
-        
+    从环境变量读取 SMTP 配置
+
     Returns:
-        str: HTML 格式的文本
+        tuple: (smtp_server, smtp_port, sender_email, smtp_password, recipient_list)
+               配置不完整时返回 None
     """
-    # 使用 markdown 库转换
-    html = markdown.markdown(
-        md_text,
-        extensions=['extra', 'codehilite', 'tables', 'fenced_code']
-    )
-    
-    # 添加 CSS 样式
-    styled_html = f"""
+    smtp_server = os.getenv("SMTP_SERVER")
+    smtp_port = int(os.getenv("SMTP_PORT", 587))
+    sender_email = os.getenv("SMTP_SENDER_EMAIL")
+    smtp_password = os.getenv("SMTP_PASSWORD")
+    recipient_email = recipient or os.getenv("EMAIL_RECIPIENT")
+
+    # 验证必要的配置
+    if not all([smtp_server, sender_email, smtp_password, recipient_email]):
+        logger.error("邮件配置不完整，请检查环境变量")
+        return None
+
+    # 支持多个收件人（逗号或分号分隔）
+    recipient_list = [e.strip() for e in recipient_email.replace(';', ',').split(',') if e.strip()]
+
+    if not recipient_list:
+        logger.error("未找到有效的收件人邮箱")
+        return None
+
+    return smtp_server, smtp_port, sender_email, smtp_password, recipient_list
+
+
+class SMTPSession:
+    """
+    可复用的 SMTP 会话：连接 / STARTTLS / 登录一次，发送多封邮件
+
+    用法:
+        with SMTPSession() as s:
+            send_email(subject1, body1, session=s)
+            send_email(subject2, body2, session=s)
+    """
+
+    def __init__(self, smtp_server=None, smtp_port=None, sender_email=None, smtp_password=None):
+        self.smtp_server = smtp_server or os.getenv("SMTP_SERVER")
+        self.smtp_port = int(smtp_port or os.getenv("SMTP_PORT", 587))
+        self.sender_email = sender_email or os.getenv("SMTP_SENDER_EMAIL")
+        self.smtp_password = smtp_password or os.getenv("SMTP_PASSWORD")
+        self.server = None
+
+    def connect(self, retries=3):
+        """
+        建立连接并登录，瞬时故障（断连/超时/灰名单）时指数退避重试
+
+        只重试连接 + 登录阶段；已收到 250 的邮件不会被重发
+        """
+        connect_timeout = int(os.getenv("SMTP_CONNECT_TIMEOUT", 30))
+        read_timeout = int(os.getenv("SMTP_READ_TIMEOUT", 60))
+        for attempt in range(retries):
+            try:
+                if self.smtp_port == 465:
+                    self.server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=connect_timeout)
+                else:
+                    self.server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=connect_timeout)
+                    self.server.ehlo()
+                    self.server.starttls()
+                    self.server.ehlo()
+                # 连接建立后放宽超时：DATA 阶段大邮件的应答可能比握手慢
+                self.server.sock.settimeout(read_timeout)
+                self.server.login(self.sender_email, self.smtp_password)
+                return self.server
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.timeout, OSError) as e:
+                if attempt == retries - 1:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("SMTP 连接失败 (%s/%s)，%s 秒后重试: %s", attempt + 1, retries, delay, e)
+                time.sleep(delay)
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.server:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def send(self, from_addr, to_addrs, msg):
+        """
+        发送一封邮件，返回被拒绝的收件人字典（全部成功时为空）
+
+        发送前用 noop() 做健康检查，连接已断开时自动重连
+        """
+        try:
+            if self.server is None:
+                raise smtplib.SMTPServerDisconnected("not connected")
+            self.server.noop()
+        except (smtplib.SMTPException, OSError):
+            logger.warning("SMTP 连接不可用，正在重连...")
+            self.connect()
+        # send_message 经 BytesGenerator 直接写 socket，不先 as_string()
+        # 物化整封邮件（HTML + 附录可达数 MB，省一份峰值内存）。
+        # 注意：smtplib 每条命令都同步等待应答，并不支持 ESMTP
+        # PIPELINING 的命令合并——单连接群发省掉的是握手和 DATA 次数
+        return self.server.send_message(msg, from_addr, to_addrs)
+
+
+# 模块级 markdown 转换器：扩展链只初始化一次，每次调用 reset() 复用
+_MD = markdown.Markdown(
+    extensions=['extra', 'codehilite', 'tables', 'fenced_code']
+)
+
+# CSS/HTML 外壳：普通字符串常量（非 f-string），{BODY} 为正文占位符
+_HTML_TEMPLATE = """
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="utf-8">
         <style>
-            body {{
+            body {
                 font-family: 'Segoe UI', 'Microsoft YaHei', Arial, sans-serif;
                 line-height: 1.7;
                 color: #2c3e50;
@@ -49,14 +154,14 @@ def markdown_to_html(md_text):
                 margin: 0 auto;
                 padding: 20px;
                 background-color: #f5f5f5;
-            }}
-            .container {{
+            }
+            .container {
                 background-color: white;
                 padding: 40px;
                 border-radius: 10px;
                 box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #1a1a1a;
                 font-size: 1.8em;
                 font-weight: 900;
@@ -67,8 +172,8 @@ def markdown_to_html(md_text):
                 background: linear-gradient(to right, #f8f9fa, white);
                 padding-left: 15px;
                 border-left: 6px solid #e74c3c;
-            }}
-            h2 {{
+            }
+            h2 {
                 color: #2c3e50;
                 font-size: 1.5em;
                 font-weight: 800;
@@ -79,45 +184,45 @@ def markdown_to_html(md_text):
                 background-color: #f8f9fa;
                 padding-top: 10px;
                 padding-bottom: 10px;
-            }}
-            h3 {{
+            }
+            h3 {
                 color: #34495e;
                 font-weight: 700;
                 margin-top: 20px;
-            }}
-            strong, b {{
+            }
+            strong, b {
                 font-weight: 900;
                 color: #c0392b;
                 background-color: #fff3cd;
                 padding: 2px 4px;
                 border-radius: 2px;
-            }}
-            a {{
+            }
+            a {
                 color: #3498db;
                 text-decoration: none;
                 font-weight: 600;
-            }}
-            a:hover {{
+            }
+            a:hover {
                 text-decoration: underline;
                 color: #2980b9;
-            }}
-            code {{
+            }
+            code {
                 background-color: #f8f9fa;
                 padding: 2px 6px;
                 border-radius: 3px;
                 font-family: 'Courier New', 'Consolas', monospace;
                 color: #e74c3c;
                 font-weight: 600;
-            }}
-            pre {{
+            }
+            pre {
                 background-color: #2c3e50;
                 color: #ecf0f1;
                 padding: 20px;
                 border-radius: 8px;
                 overflow-x: auto;
                 border-left: 5px solid #3498db;
-            }}
-            blockquote {{
+            }
+            blockquote {
                 border-left: 5px solid #f39c12;
                 padding-left: 20px;
                 margin-left: 0;
@@ -126,52 +231,52 @@ def markdown_to_html(md_text):
                 background-color: #fef5e7;
                 font-style: italic;
                 color: #555;
-            }}
-            hr {{
+            }
+            hr {
                 border: none;
                 border-top: 3px solid #3498db;
                 margin: 40px 0;
                 opacity: 0.5;
-            }}
-            ul, ol {{
+            }
+            ul, ol {
                 margin-left: 20px;
                 line-height: 1.9;
-            }}
-            li {{
+            }
+            li {
                 margin-bottom: 10px;
-            }}
-            p {{
+            }
+            p {
                 margin-bottom: 15px;
                 line-height: 1.8;
-            }}
-            table {{
+            }
+            table {
                 border-collapse: collapse;
                 width: 100%;
                 margin: 20px 0;
-            }}
-            th, td {{
+            }
+            th, td {
                 border: 1px solid #ddd;
                 padding: 12px;
                 text-align: left;
-            }}
-            th {{
+            }
+            th {
                 background-color: #3498db;
                 color: white;
                 font-weight: 700;
-            }}
-            .footer {{
+            }
+            .footer {
                 margin-top: 40px;
                 padding-top: 20px;
                 border-top: 1px solid #ddd;
                 text-align: center;
                 color: #7f8c8d;
                 font-size: 0.9em;
-            }}
+            }
         </style>
     </head>
     <body>
         <div class="container">
-            {html}
+            {BODY}
             <div class="footer">
                 <p>📧 这是一封自动生成的 BioRxiv 肿瘤学研究简报邮件</p>
                 <p>如有问题，请联系系统管理员</p>
@@ -180,138 +285,302 @@ def markdown_to_html(md_text):
     </body>
     </html>
     """
-    
-    return styled_html
+
+# 导入时就把外壳按正文占位符切成前后两段，发送时只做一次字符串拼接，
+# 不再对 ~3KB 的 CSS 外壳做整串扫描
+_HTML_PREFIX, _HTML_SUFFIX = _HTML_TEMPLATE.split('{BODY}')
 
 
-def send_email(subject, body_markdown, recipient=None):
+@functools.lru_cache(maxsize=128)
+def _render_md(md_text):
+    """渲染 Markdown 正文；重发相同内容（重试、重复的错误通知）直接命中缓存"""
+    # 复用模块级转换器（reset 清除上一次转换的内部状态）
+    _MD.reset()
+    return _MD.convert(md_text)
+
+
+def _plain_text_body(body_markdown):
+    """
+    生成纯文本备用版：去掉末尾的 ```json``` 原始数据块
+
+    该块动辄数百 KB，纯文本版带上它会让 TLS 传输量翻倍，
+    而纯文本客户端并不需要原始数据
+    """
+    return re.sub(r'```json.*?```', '[JSON data omitted]', body_markdown, flags=re.S)
+
+
+def markdown_to_html(md_text):
+    """
+    将 Markdown 文本转换为 HTML
+
+    Args:
+        md_text: Markdown 格式的文本
+
+    Returns:
+        str: HTML 格式的文本
+    """
+    # 套上 CSS 外壳
+    return _HTML_PREFIX + _render_md(md_text) + _HTML_SUFFIX
+
+
+def send_email(subject, body_markdown, recipient=None, session=None, attachment_json=None):
     """
     发送邮件
-    
+
     Args:
         subject: 邮件主题
         body_markdown: Markdown 格式的邮件正文
         recipient: 收件人邮箱（可选，默认从环境变量读取）
-        
+        session: 可复用的 SMTPSession（可选，批量发送时复用连接）
+        attachment_json: 原始数据 JSON 字符串（可选，作为附件携带）
+
     Returns:
         bool: 发送成功返回 True，失败返回 False
     """
     try:
-        # 从环境变量获取邮件配置
-        smtp_server = os.getenv("SMTP_SERVER")
-        smtp_port = int(os.getenv("SMTP_PORT", 587))
-        sender_email = os.getenv("SMTP_SENDER_EMAIL")
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        recipient_email = recipient or os.getenv("EMAIL_RECIPIENT")
-        
-        # 验证必要的配置
-        if not all([smtp_server, sender_email, smtp_password, recipient_email]):
-            logger.error("邮件配置不完整，请检查环境变量")
+        settings = _smtp_settings(recipient)
+        if settings is None:
             return False
+        smtp_server, smtp_port, sender_email, smtp_password, recipient_list = settings
+
+        logger.info("收件人列表: %s (共 %d 个)", ', '.join(recipient_list), len(recipient_list))
         
-        # 支持多个收件人（逗号或分号分隔）
-        recipient_list = []
-        for email in recipient_email.replace(';', ',').split(','):
-            email = email.strip()
-            if email:
-                recipient_list.append(email)
-        
-        if not recipient_list:
-            logger.error("未找到有效的收件人邮箱")
-            return False
-        
-        logger.info(f"收件人列表: {', '.join(recipient_list)} (共 {len(recipient_list)} 个)")
-        
-        # 预生成 HTML（所有收件人共用）
+        # 预生成 HTML 和纯文本版（所有收件人共用）
         html_body = markdown_to_html(body_markdown)
+        text_body = _plain_text_body(body_markdown)
+
+        def _attach_json(msg):
+            # 原始数据 gzip 后作为附件（JSON 文本压缩比通常 5-10 倍），
+            # 还避免了 base64 对未压缩大文本的 4/3 膨胀
+            if attachment_json is not None:
+                msg.add_attachment(
+                    gzip.compress(attachment_json.encode('utf-8')),
+                    maintype='application', subtype='gzip',
+                    filename='digest.json.gz',
+                )
         
-        logger.info(f"正在发送邮件到 {len(recipient_list)} 个收件人...")
-        
-        # 为每个收件人单独建立连接和发送（避免同一会话中的响应混淆）
-        failed_recipients = []
-        
-        for idx, recipient in enumerate(recipient_list, 1):
-            server = None
+        logger.info("正在发送邮件到 %d 个收件人...", len(recipient_list))
+
+        # 被拒绝的收件人使用独立连接（避免同一会话中的响应混淆）逐个重试
+        def _send_one(recipient):
             try:
-                logger.info(f"  [{idx}/{len(recipient_list)}] 正在发送到: {recipient}")
-                
+                logger.info("  正在发送到: %s", recipient)
+
                 # 为每个收件人创建独立的邮件对象
-                msg = MIMEMultipart('alternative')
+                msg = EmailMessage()
                 msg['From'] = f'BioRxiv <{sender_email}>'
                 msg['To'] = recipient
-                msg['Subject'] = Header(subject, 'utf-8')
-                
-                # 添加纯文本版本（作为备用）
-                text_part = MIMEText(body_markdown, 'plain', 'utf-8')
-                msg.attach(text_part)
-                
-                # 添加 HTML 版本
-                html_part = MIMEText(html_body, 'html', 'utf-8')
-                msg.attach(html_part)
-                
-                # 建立独立的 SMTP 连接
-                if smtp_port == 465:
-                    server = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=30)
-                else:
-                    server = smtplib.SMTP(smtp_server, smtp_port, timeout=30)
-                    server.ehlo()
-                    server.starttls()
-                    server.ehlo()
-                
-                # 登录并发送
-                server.login(sender_email, smtp_password)
-                server.sendmail(sender_email, [recipient], msg.as_string())
-                server.quit()
-                
-                logger.info(f"      ✅ 成功")
-                
+                msg['Subject'] = subject
+
+                # 纯文本备用版 + HTML 版本
+                msg.set_content(text_body)
+                msg.add_alternative(html_body, subtype='html')
+                _attach_json(msg)
+
+                # 建立独立的 SMTP 连接并发送
+                with SMTPSession(smtp_server, smtp_port, sender_email, smtp_password) as s:
+                    s.send(sender_email, [recipient], msg)
+
+                logger.info("      ✅ %s 成功", recipient)
+                return recipient, True
+
             except Exception as e:
-                logger.error(f"      ❌ 失败: {e}")
-                failed_recipients.append(recipient)
-            finally:
-                # 确保连接关闭
-                if server:
-                    try:
-                        server.quit()
-                    except:
-                        pass
-        
+                logger.error("      ❌ %s 失败: %s", recipient, e)
+                return recipient, False
+
+        # 优先路径：单连接 BCC 投递——所有收件人放在 SMTP 信封中，
+        # 一次握手 + 一次 DATA 即可送达全部收件人
+        msg = EmailMessage()
+        msg['From'] = f'BioRxiv <{sender_email}>'
+        msg['To'] = f'BioRxiv <{sender_email}>'  # 收件人不写入邮件头（BCC 效果）
+        msg['Subject'] = subject
+        msg.set_content(text_body)
+        msg.add_alternative(html_body, subtype='html')
+        _attach_json(msg)
+
+        retry_list = recipient_list
+        try:
+            # 调用方传入的会话直接复用（连接/登录已完成）；否则临时建一个
+            if session is not None:
+                refused = session.send(sender_email, recipient_list, msg)
+            else:
+                with SMTPSession(smtp_server, smtp_port, sender_email, smtp_password) as s:
+                    refused = s.send(sender_email, recipient_list, msg)
+
+            if not refused:
+                logger.info("✅ 邮件发送成功到所有 %d 个收件人", len(recipient_list))
+                return True
+
+            retry_list = list(refused)
+            logger.warning("⚠️ %d 个收件人被拒绝，改用独立连接重试", len(retry_list))
+
+        except smtplib.SMTPRecipientsRefused as e:
+            # 全部收件人被拒绝，逐个重试
+            retry_list = list(e.recipients)
+            logger.warning("⚠️ 所有收件人被拒绝，改用独立连接重试")
+        except Exception as e:
+            logger.warning("⚠️ 单连接群发失败: %s，改用独立连接逐个发送", e)
+
+        # 回退路径：并发逐个发送（有界线程池，连接互相独立）
+        with ThreadPoolExecutor(max_workers=min(8, len(retry_list))) as executor:
+            results = list(executor.map(_send_one, retry_list))
+
+        failed_recipients = [recipient for recipient, ok in results if not ok]
+
         # 汇总结果
         if failed_recipients:
-            logger.warning(f"⚠️ 部分邮件发送失败 ({len(failed_recipients)}/{len(recipient_list)}): {', '.join(failed_recipients)}")
+            logger.warning("⚠️ 部分邮件发送失败 (%d/%d): %s", len(failed_recipients), len(recipient_list), ', '.join(failed_recipients))
             # 只要有一个成功就返回 True
             return len(failed_recipients) < len(recipient_list)
         else:
-            logger.info(f"✅ 邮件发送成功到所有 {len(recipient_list)} 个收件人")
+            logger.info("✅ 邮件发送成功到所有 %d 个收件人", len(recipient_list))
             return True
         
     except smtplib.SMTPException as e:
-        logger.error(f"❌ SMTP 错误: {e}")
+        logger.error("❌ SMTP 错误: %s", e)
+        return False
+    except Exception as e:
+        logger.error("❌ 邮件发送失败: %s", e)
+        return False
+
+
+async def send_email_async(subject, body_markdown, recipient=None, attachment_json=None):
+    """
+    异步发送邮件（aiosmtplib），不阻塞事件循环
+
+    未安装 aiosmtplib 时回退到在线程中执行同步 send_email
+
+    Args:
+        subject: 邮件主题
+        body_markdown: Markdown 格式的邮件正文
+        recipient: 收件人邮箱（可选，默认从环境变量读取）
+        attachment_json: 原始数据 JSON 字符串（可选，作为附件携带）
+
+    Returns:
+        bool: 发送成功返回 True，失败返回 False
+    """
+    if aiosmtplib is None:
+        return await asyncio.to_thread(
+            send_email, subject, body_markdown, recipient,
+            attachment_json=attachment_json,
+        )
+
+    settings = _smtp_settings(recipient)
+    if settings is None:
         return False
+    smtp_server, smtp_port, sender_email, smtp_password, recipient_list = settings
+
+    logger.info("正在异步发送邮件到 %d 个收件人...", len(recipient_list))
+
+    html_body = markdown_to_html(body_markdown)
+    text_body = _plain_text_body(body_markdown)
+
+    # 单连接 BCC 投递（与同步路径一致）：收件人只出现在 SMTP 信封中
+    msg = EmailMessage()
+    msg['From'] = f'BioRxiv <{sender_email}>'
+    msg['To'] = f'BioRxiv <{sender_email}>'
+    msg['Subject'] = subject
+    msg.set_content(text_body)
+    msg.add_alternative(html_body, subtype='html')
+    if attachment_json is not None:
+        # 原始数据 gzip 后作为附件（与同步路径一致）
+        msg.add_attachment(
+            gzip.compress(attachment_json.encode('utf-8')),
+            maintype='application', subtype='gzip',
+            filename='digest.json.gz',
+        )
+
+    # 超时与重试策略和同步路径（SMTPSession.connect）保持一致
+    connect_timeout = int(os.getenv("SMTP_CONNECT_TIMEOUT", 30))
+    read_timeout = int(os.getenv("SMTP_READ_TIMEOUT", 60))
+    retries = 3
+
+    try:
+        smtp = aiosmtplib.SMTP(
+            hostname=smtp_server,
+            port=smtp_port,
+            use_tls=(smtp_port == 465),
+            start_tls=(smtp_port != 465),
+            timeout=connect_timeout,
+        )
+
+        # 只重试连接 + 登录阶段；已收到 250 的邮件不会被重发
+        for attempt in range(retries):
+            try:
+                await smtp.connect()
+                await smtp.login(sender_email, smtp_password)
+                break
+            except (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPServerDisconnected,
+                    aiosmtplib.SMTPTimeoutError, OSError) as e:
+                if attempt == retries - 1:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("SMTP 连接失败 (%s/%s)，%s 秒后重试: %s", attempt + 1, retries, delay, e)
+                await asyncio.sleep(delay)
+
+        try:
+            # 发送阶段放宽超时：DATA 阶段大邮件的应答可能比握手慢
+            refused, _ = await smtp.send_message(
+                msg, sender=sender_email, recipients=recipient_list, timeout=read_timeout,
+            )
+        finally:
+            try:
+                await smtp.quit()
+            except Exception:
+                pass
+
+        if refused:
+            logger.warning("⚠️ 部分邮件发送失败 (%d/%d): %s", len(refused), len(recipient_list), ', '.join(refused))
+            return len(refused) < len(recipient_list)
+
+        logger.info("✅ 邮件发送成功到所有 %d 个收件人", len(recipient_list))
+        return True
+
     except Exception as e:
-        logger.error(f"❌ 邮件发送失败: {e}")
+        logger.error("❌ 异步邮件发送失败: %s", e)
         return False
 
 
-def send_digest_email(period_label, summary_text):
+def send_digest_email(period_label, summary_text, items_json=None):
     """
     发送研究简报邮件
-    
+
     Args:
         period_label: 期别标签（早报/晚报）
         summary_text: 摘要文本（Markdown 格式）
-        
+        items_json: 原始数据 JSON 字符串（可选，作为附件携带）
+
     Returns:
         bool: 发送成功返回 True
     """
     from datetime import datetime
-    
+
     # 生成邮件主题
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
     subject = f"📬 BioRxiv 肿瘤学研究{period_label} - {current_time}"
-    
+
     # 发送邮件
-    return send_email(subject, summary_text)
+    return send_email(subject, summary_text, attachment_json=items_json)
+
+
+async def send_digest_email_async(period_label, summary_text, items_json=None):
+    """
+    异步发送研究简报邮件（供事件循环内的调用方使用）
+
+    Args:
+        period_label: 期别标签（早报/晚报）
+        summary_text: 摘要文本（Markdown 格式）
+        items_json: 原始数据 JSON 字符串（可选，作为附件携带）
+
+    Returns:
+        bool: 发送成功返回 True
+    """
+    from datetime import datetime
+
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
+    subject = f"📬 BioRxiv 肿瘤学研究{period_label} - {current_time}"
+
+    return await send_email_async(subject, summary_text, attachment_json=items_json)
 
 
 def send_error_notification(error_msg):
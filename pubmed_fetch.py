@@ -4,15 +4,91 @@ PubMed 文章获取模块
 用于获取 Nature、Science、Cell 等顶级期刊的最新文章
 """
 
+import io
 import requests
+import threading
 import time
 import logging
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from xml.etree import ElementTree as ET
 from dateutil import parser as date_parser
 
 logger = logging.getLogger(__name__)
 
+try:
+    import lxml.etree as LET
+except ImportError:
+    LET = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+
+class _RateLimiter:
+    """令牌桶限速器：多线程共享，保证总请求速率不超过 NCBI 限制"""
+
+    def __init__(self, rate=3.0):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# NCBI 公共接口限 3 req/s（带 API key 可到 10）
+_RATE_LIMITER = _RateLimiter(rate=3.0)
+
+# 模块级连接池会话：所有 E-utilities 请求共用 TCP/TLS 连接（keep-alive），
+# 429/5xx 的指数退避重试交给适配器的 Retry 处理。
+# 装了 requests-cache 时改用落盘缓存会话：早/晚两期的查询高度重叠，
+# 缓存命中省掉整个网络往返；stale_if_error 让 NCBI 5xx 时回退到过期缓存
+if requests_cache is not None:
+    _SESSION = requests_cache.CachedSession(
+        '.pubmed_cache',
+        backend='sqlite',
+        expire_after=3600,
+        allowable_methods=['GET'],
+        stale_if_error=True,
+    )
+else:
+    _SESSION = requests.Session()
+_SESSION.headers['Accept-Encoding'] = 'gzip'
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+
+def _get_with_retry(url, params, timeout):
+    """
+    经限速器发起 GET 请求（重试 / 连接复用由 _SESSION 负责）
+    """
+    _RATE_LIMITER.acquire()
+    response = _SESSION.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response
+
 # PubMed E-utilities API
 PUBMED_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
 ESEARCH_URL = PUBMED_BASE_URL + "esearch.fcgi"
@@ -70,18 +146,17 @@ def search_pubmed(query, days=7, max_results=100):
     }
     
     try:
-        logger.info(f"正在搜索 PubMed: {query}")
-        response = requests.get(ESEARCH_URL, params=params, timeout=30)
-        response.raise_for_status()
-        
+        logger.info("正在搜索 PubMed: %s", query)
+        response = _get_with_retry(ESEARCH_URL, params, timeout=30)
+
         data = response.json()
         id_list = data.get("esearchresult", {}).get("idlist", [])
         
-        logger.info(f"找到 {len(id_list)} 篇 PubMed 文章")
+        logger.info("找到 %d 篇 PubMed 文章", len(id_list))
         return id_list
         
     except Exception as e:
-        logger.error(f"PubMed 搜索失败: {e}")
+        logger.error("PubMed 搜索失败: %s", e)
         return []
 
 
@@ -113,84 +188,96 @@ def fetch_pubmed_details(pmid_list):
         }
         
         try:
-            logger.info(f"正在获取 {len(batch)} 篇文章详情...")
-            response = requests.get(EFETCH_URL, params=params, timeout=60)
-            response.raise_for_status()
-            
-            # 解析 XML
-            root = ET.fromstring(response.content)
-            
-            for article_elem in root.findall(".//PubmedArticle"):
-                article = parse_pubmed_article(article_elem)
-                if article:
-                    articles.append(article)
-            
-            time.sleep(0.5)  # 避免请求过快
-            
+            logger.info("正在获取 %d 篇文章详情...", len(batch))
+            response = _get_with_retry(EFETCH_URL, params, timeout=60)
+
+            # 解析 XML：优先 lxml 流式解析（逐篇产出并释放，
+            # 内存只保留当前一篇，200 篇的批量不再整树驻留）
+            if LET is not None:
+                for _, elem in LET.iterparse(io.BytesIO(response.content), tag='PubmedArticle'):
+                    article = parse_pubmed_article(elem)
+                    if article:
+                        articles.append(article)
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+            else:
+                root = ET.fromstring(response.content)
+                for article_elem in root.findall(".//PubmedArticle"):
+                    article = parse_pubmed_article(article_elem)
+                    if article:
+                        articles.append(article)
+
         except Exception as e:
-            logger.error(f"获取 PubMed 详情失败: {e}")
+            logger.error("获取 PubMed 详情失败: %s", e)
             continue
     
     return articles
 
 
+# 月份名 -> 数字（模块级常量，不在每篇文章的解析中重建）
+_MONTH_MAP = {
+    "Jan": "1", "Feb": "2", "Mar": "3", "Apr": "4",
+    "May": "5", "Jun": "6", "Jul": "7", "Aug": "8",
+    "Sep": "9", "Oct": "10", "Nov": "11", "Dec": "12"
+}
+
+
 def parse_pubmed_article(article_elem):
     """
     解析单篇 PubMed 文章
-    
+
+    路径按 PubMed DTD 写成直接子路径（MedlineCitation/...），
+    避免 .// 对整棵子树做全量扫描
+
     Args:
         article_elem: XML Element
-        
+
     Returns:
         dict: 文章信息
     """
     try:
         # PMID
-        pmid = article_elem.findtext(".//PMID")
-        
+        pmid = article_elem.findtext("MedlineCitation/PMID")
+
         # 标题
-        title = article_elem.findtext(".//ArticleTitle", "")
-        
+        title = article_elem.findtext("MedlineCitation/Article/ArticleTitle", "")
+
         # 摘要
-        abstract_parts = article_elem.findall(".//AbstractText")
+        abstract_parts = article_elem.findall("MedlineCitation/Article/Abstract/AbstractText")
         abstract = " ".join([p.text or "" for p in abstract_parts if p.text])
-        
+
         # 作者
         authors = []
-        for author in article_elem.findall(".//Author"):
+        for author in article_elem.findall("MedlineCitation/Article/AuthorList/Author"):
             last_name = author.findtext("LastName", "")
             fore_name = author.findtext("ForeName", "")
             if last_name:
                 authors.append(f"{fore_name} {last_name}".strip())
-        
+
         # 期刊
-        journal = article_elem.findtext(".//Journal/Title", "")
-        
+        journal = article_elem.findtext("MedlineCitation/Article/Journal/Title", "")
+
         # 发布日期
-        pub_date_elem = article_elem.find(".//PubDate")
+        pub_date_elem = article_elem.find("MedlineCitation/Article/Journal/JournalIssue/PubDate")
         pub_date = None
         if pub_date_elem is not None:
             year = pub_date_elem.findtext("Year")
             month = pub_date_elem.findtext("Month", "1")
             day = pub_date_elem.findtext("Day", "1")
-            
+
             try:
                 # 尝试解析月份名称
-                month_map = {
-                    "Jan": "1", "Feb": "2", "Mar": "3", "Apr": "4",
-                    "May": "5", "Jun": "6", "Jul": "7", "Aug": "8",
-                    "Sep": "9", "Oct": "10", "Nov": "11", "Dec": "12"
-                }
-                month = month_map.get(month, month)
-                
+                month = _MONTH_MAP.get(month, month)
+
                 date_str = f"{year}-{month}-{day}"
                 pub_date = datetime.strptime(date_str, "%Y-%m-%d")
             except:
                 pub_date = datetime.now()
-        
+
         # DOI
         doi = ""
-        for article_id in article_elem.findall(".//ArticleId"):
+        for article_id in article_elem.findall("PubmedData/ArticleIdList/ArticleId"):
             if article_id.get("IdType") == "doi":
                 doi = article_id.text
                 break
@@ -214,7 +301,7 @@ def parse_pubmed_article(article_elem):
         }
         
     except Exception as e:
-        logger.error(f"解析文章失败: {e}")
+        logger.error("解析文章失败: %s", e)
         return None
 
 
@@ -230,44 +317,33 @@ def fetch_top_journals(keywords, days=7, max_per_journal=10):
     Returns:
         list: 文章列表
     """
-    all_articles = []
-    seen_pmids = set()
-    
     # 构建关键词查询
     keyword_query = " OR ".join([f'"{kw}"' for kw in keywords[:5]])  # 只用前5个关键词
-    
-    for journal_name, journal_query in TOP_JOURNALS.items():
-        try:
-            logger.info(f"正在搜索 {journal_name}...")
-            
-            # 组合查询：期刊 + 关键词
-            query = f"({journal_query}) AND ({keyword_query})"
-            
-            # 搜索文章
-            pmid_list = search_pubmed(query, days=days, max_results=max_per_journal)
-            
-            if not pmid_list:
-                continue
-            
-            # 获取详情
-            articles = fetch_pubmed_details(pmid_list)
-            
-            # 去重并添加
-            for article in articles:
-                pmid = article.get("pmid")
-                if pmid and pmid not in seen_pmids:
-                    seen_pmids.add(pmid)
-                    all_articles.append(article)
-            
-            logger.info(f"从 {journal_name} 获取到 {len(articles)} 篇文章")
-            
-            time.sleep(1)  # 避免请求过快
-            
-        except Exception as e:
-            logger.error(f"从 {journal_name} 获取文章失败: {e}")
-            continue
-    
-    logger.info(f"总共从顶级期刊获取到 {len(all_articles)} 篇文章")
+
+    # PubMed 支持跨期刊的布尔 OR：16 个期刊合成一个查询，
+    # 1 次 ESearch + 1 轮批量 EFetch 就拿到全部结果（原来是 16 次往返）
+    journals_clause = "(" + " OR ".join(TOP_JOURNALS.values()) + ")"
+    query = f"{journals_clause} AND ({keyword_query})"
+
+    logger.info("正在搜索 %d 个顶级期刊（合并查询）...", len(TOP_JOURNALS))
+    pmid_list = search_pubmed(query, days=days, max_results=len(TOP_JOURNALS) * max_per_journal)
+
+    if not pmid_list:
+        logger.info("总共从顶级期刊获取到 0 篇文章")
+        return []
+
+    articles = fetch_pubmed_details(pmid_list)
+
+    # 按 PMID 去重（合并查询下理论上不会重复，保险起见保留）
+    all_articles = []
+    seen_pmids = set()
+    for article in articles:
+        pmid = article.get("pmid")
+        if pmid and pmid not in seen_pmids:
+            seen_pmids.add(pmid)
+            all_articles.append(article)
+
+    logger.info("总共从顶级期刊获取到 %d 篇文章", len(all_articles))
     return all_articles
 
 
@@ -283,16 +359,33 @@ def filter_by_keywords(articles, keywords):
         list: 过滤后的文章
     """
     filtered = []
-    
+
+    # 优先 Aho–Corasick 多模式匹配（C 实现的自动机，一次扫描文本
+    # 即可判定是否命中任意关键词，与关键词数量无关）
+    if ahocorasick is not None and keywords:
+        automaton = ahocorasick.Automaton()
+        for kw in keywords:
+            automaton.add_word(kw.lower(), True)
+        automaton.make_automaton()
+
+        for article in articles:
+            text = (article.get("title", "") + " " + article.get("abstract", "")).lower()
+            if next(automaton.iter(text), None) is not None:
+                filtered.append(article)
+        return filtered
+
+    # 回退：纯 Python 逐关键词子串扫描
+    # 关键词只 lower() 一次，不在每篇文章的检查里重复
+    kw_lowers = tuple(kw.lower() for kw in keywords)
+
     for article in articles:
-        title = article.get("title", "").lower()
-        abstract = article.get("abstract", "").lower()
-        text = title + " " + abstract
-        
+        # 一次拼接、一次 lower
+        text = (article.get("title", "") + " " + article.get("abstract", "")).lower()
+
         # 检查是否包含任意关键词
-        if any(kw.lower() in text for kw in keywords):
+        if any(kw in text for kw in kw_lowers):
             filtered.append(article)
-    
+
     return filtered
 
 
@@ -313,11 +406,12 @@ def fetch_pubmed_articles(cfg, days=7):
         if "any" in query_block:
             keywords.extend(query_block["any"])
     
-    # 去重
-    keywords = list(set(keywords))
+    # 去重（保序：dict.fromkeys 保持配置顺序，生成的查询串
+    # 每次运行都一致，上游缓存/日志对比才有意义）
+    keywords = list(dict.fromkeys(keywords))
     
-    logger.info(f"使用 {len(keywords)} 个关键词搜索 PubMed")
-    logger.info(f"关键词: {', '.join(keywords[:10])}...")
+    logger.info("使用 %d 个关键词搜索 PubMed", len(keywords))
+    logger.info("关键词: %s...", ', '.join(keywords[:10]))
     
     # 从顶级期刊获取文章
     articles = fetch_top_journals(keywords, days=days, max_per_journal=10)
@@ -325,7 +419,7 @@ def fetch_pubmed_articles(cfg, days=7):
     # 关键词过滤（二次筛选）
     articles = filter_by_keywords(articles, keywords)
     
-    logger.info(f"关键词过滤后剩余 {len(articles)} 篇文章")
+    logger.info("关键词过滤后剩余 %d 篇文章", len(articles))
     
     return articles
 
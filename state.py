@@ -30,14 +30,38 @@ class PeriodState:
         d.mkdir(exist_ok=True)
         return d
 
+    @staticmethod
+    def _write_atomic(path, text: str):
+        # 先写临时文件再 rename，中途崩溃不会留下半截文件
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+
     def save_raw(self, data):
-        self.raw_json.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        self._write_atomic(self.raw_json, json.dumps(data, ensure_ascii=False, indent=2))
 
     def save_report(self, md: str):
-        self.report_md.write_text(md, encoding="utf-8")
+        self._write_atomic(self.report_md, md)
 
     def save_prompt(self, txt: str):
-        self.prompt_context.write_text(txt, encoding="utf-8")
+        self._write_atomic(self.prompt_context, txt)
+
+    def save_prompt_stream(self, data_json: str, md: str):
+        # 流式写入上下文，避免在内存中拼接整个大字符串
+        # data_json: 已序列化好的紧凑 JSON 字符串（调用方与 LLM 输入共用一份）
+        tmp = self.prompt_context.with_name(self.prompt_context.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write("# 原始条目 (JSON)\n")
+            f.write(data_json)
+            f.write("\n\n# 研究简报 (Markdown)\n")
+            f.write(md)
+        os.replace(tmp, self.prompt_context)
+
+    def save_all(self, data, data_json: str, md: str):
+        # 批量落盘 raw/report/prompt，供后台线程一次性调用
+        self.save_raw(data)
+        self.save_report(md)
+        self.save_prompt_stream(data_json, md)
 
     def append_chat(self, author: str, msg: str):
         idx = len(list(self.chat_dir.glob("*.txt"))) + 1
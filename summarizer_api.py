@@ -4,12 +4,22 @@
 """
 
 import os
+import re
 import requests
 import json
 import logging
+from requests.adapters import HTTPAdapter
+
+from prompts import PROMPT_TEMPLATE
 
 logger = logging.getLogger(__name__)
 
+# 模块级连接池会话：早/晚两期（以及同一期内的连接测试 + 正式调用、
+# 退避重试）共用到 api.siliconflow.cn 的 TLS 连接，省掉每次
+# 200-500ms 的握手。重试由上层的退避循环负责，适配器不做自动重试
+_LLM_SESSION = requests.Session()
+_LLM_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
 
 def test_api_connection(api_key, model="moonshotai/Kimi-K2-Instruct-0905", timeout=30):
     """
@@ -38,7 +48,7 @@ def test_api_connection(api_key, model="moonshotai/Kimi-K2-Instruct-0905", timeo
     }
     
     try:
-        response = requests.post(api_url, json=payload, headers=headers, timeout=timeout)
+        response = _LLM_SESSION.post(api_url, json=payload, headers=headers, timeout=timeout)
         response.raise_for_status()
         result = response.json()
         
@@ -51,251 +61,27 @@ def test_api_connection(api_key, model="moonshotai/Kimi-K2-Instruct-0905", timeo
             return False
             
     except requests.exceptions.Timeout:
-        logger.warning(f"⚠️ API 连接超时 ({timeout}s)")
+        logger.warning("⚠️ API 连接超时 (%ss)", timeout)
         return False
     except requests.exceptions.RequestException as e:
-        logger.warning(f"⚠️ API 连接失败: {e}")
+        logger.warning("⚠️ API 连接失败: %s", e)
         return False
     except Exception as e:
-        logger.warning(f"⚠️ API 测试异常: {e}")
+        logger.warning("⚠️ API 测试异常: %s", e)
         return False
 
 
-PROMPT_TEMPLATE = """
-你是一位世界顶尖的生物医学研究专家，专注于肿瘤学（Oncology）、癌症生物学（Cancer Biology）和单细胞组学（Single-cell Omics）领域。
-
-**【关键要求】**：
-你必须严格遵守以下五个核心标准（Quality Standards）：
-
-**S1 - 极高准确性 (High Fidelity)**：
-- 禁止出现任何"幻觉"（Hallucination）
-- 所有数值、基因名、实验对象必须来自原文
-- 如果原文没有明确数据，说明"未提供具体数值"
-
-**S2 - 关注核心创新点 (Novelty Focus)**：
-- 明确指出：新靶点？新模型？新机制？新策略？
-- 避免大篇幅描述背景知识
-
-**S3 - 关键定量数据提取 (Quantitative Data)**：
-- 每篇文章必须提取至少1-2个关键数值
-- 例如：准确率95.2%、肿瘤体积抑制率75%、P值、样本量等
-
-**S4 - 肿瘤学相关性 (Oncology Context)**：
-- 明确癌症类型（NSCLC、胶质母细胞瘤等）
-- 明确分子靶点（EGFR、PD-L1、KRAS等）
-- 明确技术平台（scRNA-seq、CRISPR等）
-
-**S5 - 行动力 (Actionability)**：
-- 读者能立即判断：是否与我的研究相关？
-- 是否需要深入阅读？
-
----
-
-# 🧬 肿瘤学与单细胞生物学研究深度报告
-
-## 【期别】{period_label}
-## 【时间范围】{since} ~ {now}
-## 【文章数量】共 {total_papers} 篇
-
----
-
-## 📊 一、研究全景概览
-
-### 1.1 研究热点分布
-请详细分析本期文章涵盖的主要研究领域和热点分布（200-300字）：
-- 肿瘤类型分布（乳腺癌、肺癌、结直肠癌等）
-- 研究技术分布（单细胞测序、空间转录组、CRISPR等）
-- 研究主题分布（免疫治疗、肿瘤微环境、耐药机制等）
-
-### 1.2 技术方法趋势
-分析本期文章使用的主要技术方法和创新点：
-- 单细胞/空间组学技术的应用情况
-- 多组学整合分析的趋势
-- 新兴技术平台和工具
-
-### 1.3 研究范式演变
-总结当前肿瘤研究的范式转变和未来方向
-
----
-
-## 🔬 二、重点文章深度解析
-
-**【重要格式要求】**：
-1. ✅ **文章标题必须使用 # 一级标题**，确保醒目
-2. ✅ **关键数据、基因名、创新点必须加粗** (使用 **粗体**)
-3. ✅ **每篇文章之间用 --- 水平线明确分隔**
-4. ✅ **核心发现、关键数值、重要结论必须突出显示**
-
-请对**每篇文章**严格按照以下模板生成摘要,要美观，好看：
-
----
----
-
-# 📄 文章 [编号]：[完整文章标题]
-
-**【结构 A：文章元数据】**
-
-**作者及单位**：[第一作者]（[单位]）、[通讯作者]（[单位]）
-
-**来源**：[BioRxiv/PubMed/期刊名] | **DOI/链接**：[链接]
-
-**发布日期**：[YYYY-MM-DD]
-
----
-
-**【结构 B：核心摘要区】** *(由 DeepSeek V3.2 生成)*
-
-**1️⃣ 研究痛点 (Background & Gap)** [1-2句话]
-> 当前肿瘤治疗/认知中存在什么核心问题？
-[基于原文的简洁描述]
-
-**2️⃣ 核心创新 (Novel Contribution)** [2句话，最重要] ⭐
-> 本文提出了什么新概念/新模型/新机制/新靶点？
-- **创新类型**：**[新靶点/新模型/新机制/新策略]** ← 必须加粗
-- **具体描述**：[详细说明创新点，**关键词必须加粗**]
-
-**3️⃣ 关键发现 (Key Findings & Data)** [2-3句话，必须含数值] ⭐⭐
-> 最重要的1-2个结果是什么？
-- **发现1**：[描述] + **数据**：**[具体数值，如 P<0.001, 准确率92%]** ← 数值必须加粗
-- **发现2**：[描述] + **数据**：**[具体数值]** ← 数值必须加粗
-- **关键机制**：[如果有，描述生物学机制，**关键基因/蛋白名必须加粗**]
-
-**4️⃣ 技术细节 (Methodology & Tech)** [1句话]
-> 使用了哪些高通量/AI/计算方法？
-[如：scRNA-seq + 深度学习模型 / CRISPR筛选 / 空间转录组]
-
-**5️⃣ 结论与意义 (Conclusion & Impact)** [1句话]
-> 对临床转化/未来研究的意义？
-[简洁明确的价值陈述]
-
----
-
-**【结构 C：AI 辅助标签与评分】**
-
-**🏷️ 关键实体标签 (Entities)**：
-- **癌症类型**：[具体癌种，如：非小细胞肺癌、胰腺癌]
-- **关键基因/靶点**：[如：KRAS G12C、PD-L1、EGFR]
-- **核心技术**：[如：scRNA-seq、空间转录组、GNN模型]
-
-**🎯 AI 主题分类 (Topic)**：
-- [主要分类：如 计算药理学/肿瘤微环境/免疫治疗/单细胞组学]
-- [次要分类：如 耐药机制/生物标志物发现]
+# 导入时按占位符把模板切成片段：渲染变成 O(占位符数) 的 join，
+# 不再让 .format 每次调用都重新扫描整个 ~6KB 模板找 {…}
+_PROMPT_PARTS = re.split(r'\{(\w+)\}', PROMPT_TEMPLATE)
 
-**⭐ 评估得分 (LLM Assessment)**：
-- **相关性得分**：[1-10分，基于肿瘤学和单细胞技术的相关性]
-- **创新性得分**：[1-10分，基于方法和发现的新颖性]
-- **临床转化潜力**：[高/中/低]
-- **阅读优先级**：[极高/高/中/低] + [推荐理由1句话]
 
-**⚠️ 局限性提示**：
-[简要指出1-2个研究局限，如：样本量较小/需要临床验证/机制尚不完全清楚]
-
----
-
-## 🎓 三、学科交叉与技术整合分析
-
-### 3.1 单细胞技术的应用深度
-- 单细胞转录组学（scRNA-seq）的最新应用
-- 空间转录组学（Spatial Transcriptomics）的突破
-- 单细胞多组学（Multi-omics）整合策略
-- 细胞异质性分析的新见解
-
-### 3.2 肿瘤微环境研究进展
-- TME细胞组成的新认识
-- 细胞-细胞相互作用网络
-- 免疫抑制机制
-- 代谢重编程
-
-### 3.3 精准医学与个体化治疗
-- 基于组学的患者分层策略
-- 耐药机制与克服策略
-- 免疫治疗响应预测
-- 联合治疗的理论基础
-
----
-
-## 🔮 四、前沿趋势与未来展望
-
-### 4.1 当前研究热点
-详细分析3-5个最热门的研究方向，包括：
-- 研究现状
-- 技术瓶颈
-- 突破方向
-
-### 4.2 新兴技术展望
-- 空间多组学的发展方向
-- AI/机器学习在肿瘤研究中的应用
-- 单细胞CRISPR筛选技术
-- 活细胞成像技术
-
-### 4.3 临床转化路径
-- 从基础到临床的转化策略
-- 监管与伦理考虑
-- 商业化前景
-
-### 4.4 学科融合趋势
-- 系统生物学与网络医学
-- 计算生物学的角色
-- 工程学与生物学的交叉
-
----
-
-## 💎 五、关键见解与启示
-
-请总结本期最重要的3-5个**take-home message**：
-1. [关键见解1：深入阐述]
-2. [关键见解2：深入阐述]
-3. [关键见解3：深入阐述]
-
----
-
-## 📚 六、推荐阅读与延伸
-
-### 必读文章（按重要性排序）
-1. [文章标题] - 推荐理由
-2. [文章标题] - 推荐理由
-3. [文章标题] - 推荐理由
-
-### 相关领域拓展
-- 建议关注的相关研究方向
-- 值得深入学习的技术方法
-- 推荐的综述文章主题
-
----
-
-## 🔗 七、完整文章列表
-
-[按研究类型/重要性分类列出所有文章标题和链接]
-
----
-
-## 📎 附录：原始数据
-
-```json
-{items_json}
-```
-
----
-
-**【严格要求】**：
-
-1. ✅ **禁止幻觉**：所有数据必须来自原文，不得编造
-2. ✅ **必须提取数值**：每篇文章至少1-2个关键数值，**数值必须加粗**
-3. ✅ **明确癌症类型**：必须指出具体癌种，**癌种名称必须加粗**
-4. ✅ **突出创新点**：用"新靶点/新模型/新机制"明确标注，**必须加粗**
-5. ✅ **可操作性**：读者能立即判断是否需要深入阅读
-6. ✅ **使用专业术语**：NSCLC、scRNA-seq、TME、PDX等标准缩写，**关键术语加粗**
-7. ✅ **结构化输出**：严格按照上述模板格式输出
-8. ✅ **排版要求**：
-   - 每篇文章标题使用 # 一级标题
-   - 文章之间用 `---` 分隔线明确分界
-   - 所有关键数据、基因名、创新点、数值用 **粗体**
-   - 癌症类型、分子靶点、技术平台名称用 **粗体**
-
----
-
-**请开始生成符合上述标准的深度分析报告**：
-""".strip()
+def _render_prompt(**values):
+    """填充提示词模板（re.split 捕获组让奇数位元素是占位符名）"""
+    return "".join(
+        values[part] if i % 2 else part
+        for i, part in enumerate(_PROMPT_PARTS)
+    )
 
 
 def generate_summary_with_api(cfg, period_label, since_str, now_str, items_json):
@@ -328,14 +114,25 @@ def generate_summary_with_api(cfg, period_label, since_str, now_str, items_json)
     
     # 解析文章数据
     papers = json.loads(items_json)
-    
+
+    # 截断摘要后再喂给 LLM：API 的延迟和计费都随输入 token 线性增长，
+    # 800 字符足够模型提炼要点；完整版 items_json 留给邮件附件/落盘
+    max_abstract_chars = 800
+    prompt_papers = []
+    for p in papers:
+        abstract = p.get("abstract", "")
+        if len(abstract) > max_abstract_chars:
+            p = dict(p, abstract=abstract[:max_abstract_chars] + "…")
+        prompt_papers.append(p)
+    items_json_short = json.dumps(prompt_papers, ensure_ascii=False, separators=(',', ':'))
+
     # 生成提示词
-    prompt = PROMPT_TEMPLATE.format(
+    prompt = _render_prompt(
         period_label=period_label,
         since=since_str,
         now=now_str,
-        total_papers=len(papers),
-        items_json=items_json
+        total_papers=str(len(papers)),
+        items_json=items_json_short
     )
     
     # 构建 API 请求
@@ -359,18 +156,20 @@ def generate_summary_with_api(cfg, period_label, since_str, now_str, items_json)
         "temperature": temperature,
         "max_tokens": max_tokens,
         "top_p": top_p,
+        # SSE 流式返回：边生成边接收，不等整个响应体攒齐再解码
+        "stream": True,
     }
     
     try:
-        logger.info(f"正在调用 SiliconFlow API 生成摘要...")
-        logger.info(f"使用模型: {model}")
-        logger.info(f"处理文章数: {len(papers)}")
+        logger.info("正在调用 SiliconFlow API 生成摘要...")
+        logger.info("使用模型: %s", model)
+        logger.info("处理文章数: %d", len(papers))
         
         # 先测试 API 连接（带重试）
         logger.info("📡 测试 API 连接...")
         api_connected = False
         for test_attempt in range(1, 6):
-            logger.info(f"   尝试连接 API ({test_attempt}/5)...")
+            logger.info("   尝试连接 API (%s/5)...", test_attempt)
             if test_api_connection(api_key, model, timeout=30):
                 api_connected = True
                 break
@@ -378,7 +177,7 @@ def generate_summary_with_api(cfg, period_label, since_str, now_str, items_json)
                 if test_attempt < 5:
                     import time
                     wait_time = min(5 * test_attempt, 20)
-                    logger.warning(f"   等待 {wait_time} 秒后重试...")
+                    logger.warning("   等待 %s 秒后重试...", wait_time)
                     time.sleep(wait_time)
         
         if not api_connected:
@@ -390,10 +189,27 @@ def generate_summary_with_api(cfg, period_label, since_str, now_str, items_json)
         last_err = None
         for attempt in range(1, 6):
             try:
-                response = requests.post(api_url, json=payload, headers=headers, timeout=timeout_seconds)
+                response = _LLM_SESSION.post(api_url, json=payload, headers=headers, timeout=timeout_seconds, stream=True)
                 response.raise_for_status()
-                result = response.json()
-                summary = result['choices'][0]['message']['content'].strip()
+                # 逐行消费 SSE 增量（"data: {…}"），最后一次性 join；
+                # 内存里不再同时存在完整响应 JSON 和解码后的大字典
+                parts = []
+                for line in response.iter_lines():
+                    if not line or not line.startswith(b"data: "):
+                        continue
+                    chunk = line[6:]
+                    if chunk == b"[DONE]":
+                        break
+                    choices = json.loads(chunk).get('choices') or []
+                    if choices:
+                        delta = choices[0].get('delta', {}).get('content', '')
+                        if delta:
+                            parts.append(delta)
+                summary = "".join(parts).strip()
+                if not summary:
+                    # 200 但流里没有任何内容增量（如 SSE error 事件）：
+                    # 按请求失败处理，走下面的退避重试而不是发空简报
+                    raise requests.exceptions.RequestException("流式响应为空")
                 # 在日志中打印模型输出（截断以防日志过长）
                 try:
                     preview_len = 2000
@@ -405,32 +221,31 @@ def generate_summary_with_api(cfg, period_label, since_str, now_str, items_json)
                 break
             except requests.exceptions.ReadTimeout as e:
                 last_err = e
-                logger.warning(f"第 {attempt}/5 次调用超时（{timeout_seconds}s），将退避重试...")
+                logger.warning("第 %s/5 次调用超时（%ss），将退避重试...", attempt, timeout_seconds)
                 import time
                 time.sleep(min(8 * attempt, 30))
             except requests.exceptions.RequestException as e:
                 last_err = e
-                logger.warning(f"第 {attempt}/5 次调用失败：{e}，将退避重试...")
+                logger.warning("第 %s/5 次调用失败：%s，将退避重试...", attempt, e)
                 import time
                 time.sleep(min(8 * attempt, 30))
         else:
             # 全部重试失败
             raise last_err if last_err else RuntimeError("LLM 请求失败")
         
-        logger.info(f"摘要生成成功，长度: {len(summary)} 字符")
-        
-        # 添加原始数据链接
-        summary += f"\n\n---\n\n## 原始数据\n\n```json\n{items_json}\n```"
-        
+        logger.info("摘要生成成功，长度: %d 字符", len(summary))
+
+        # 原始数据不再拼进正文，由邮件模块作为附件单独携带
+
         return summary
         
     except requests.exceptions.RequestException as e:
-        logger.error(f"API 调用失败: {e}")
+        logger.error("API 调用失败: %s", e)
         if hasattr(e, 'response') and e.response is not None:
-            logger.error(f"响应内容: {e.response.text}")
+            logger.error("响应内容: %s", e.response.text)
         raise
     except Exception as e:
-        logger.error(f"生成摘要时发生错误: {e}")
+        logger.error("生成摘要时发生错误: %s", e)
         raise
 
 